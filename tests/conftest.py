@@ -0,0 +1,73 @@
+"""
+测试公用的假 WebDriver：只记录调用，不启动浏览器
+"""
+
+import base64
+
+import pytest
+
+
+class FakeDriver:
+    """模拟截图流程用到的 WebDriver 接口"""
+
+    def __init__(self):
+        self.cdp_calls = []
+        self.visited = []
+        self.window_handles = ["tab-0"]
+        self.current_window_handle = "tab-0"
+        self.origins = {}
+        self.quit_called = False
+        self.switch_to = self
+
+    def window(self, handle):
+        self.current_window_handle = handle
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+    def quit(self):
+        self.quit_called = True
+
+    def set_page_load_timeout(self, timeout):
+        pass
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_async_script(self, script, *args):
+        return True
+
+    def execute_script(self, script, *args):
+        if script.startswith("window.open"):
+            self.window_handles.append(f"tab-{len(self.window_handles)}")
+        elif script.startswith("window.location.href"):
+            self.visited.append(args[0])
+        elif script == "return document.readyState":
+            return "complete"
+        return None
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.cdp_calls.append((cmd, params))
+        if cmd == "Page.getLayoutMetrics":
+            size = {"width": 800, "height": 600}
+            return {"cssContentSize": size,
+                    "cssLayoutViewport": {"clientWidth": 800, "clientHeight": 600}}
+        if cmd == "Page.getFrameTree":
+            # origins 中每个标签页对应一组源：第一个为主框架，其余为 iframe
+            origins = self.origins.get(self.current_window_handle, ["null"])
+            children = [{"frame": {"securityOrigin": origin}} for origin in origins[1:]]
+            return {"frameTree": {"frame": {"securityOrigin": origins[0]}, "childFrames": children}}
+        if cmd == "Page.captureScreenshot":
+            return {"data": base64.b64encode(b"image").decode()}
+        return {}
+
+    def cdp_commands(self):
+        return [cmd for cmd, _ in self.cdp_calls]
+
+
+@pytest.fixture
+def fake_driver():
+    return FakeDriver()
@@ -0,0 +1,152 @@
+"""
+BrowserPool 的测试：以假的 WebDriver 代替 Chrome，只检查池的记录与复用逻辑
+"""
+
+import threading
+
+import pytest
+
+from tests.conftest import FakeDriver
+from webpage_screenshot import pool as pool_module
+from webpage_screenshot.pool import BrowserPool
+
+
+@pytest.fixture
+def launches(monkeypatch):
+    """替换 setup_driver，返回每次启动时传入的 disk_cache_dir 列表"""
+    launched = []
+
+    def setup_driver(headless, window_width, window_height, verbose,
+                     page_load_timeout, disk_cache_dir=None):
+        launched.append(disk_cache_dir)
+        return FakeDriver()
+
+    monkeypatch.setattr(pool_module, "setup_driver", setup_driver)
+    return launched
+
+
+def viewport_overrides(driver):
+    return [params for cmd, params in driver.cdp_calls if cmd == "Emulation.setDeviceMetricsOverride"]
+
+
+def test_acquire_reuses_released_driver(launches):
+    pool = BrowserPool(pool_size=1)
+    driver = pool.acquire(verbose=False)
+    pool.release(driver)
+    assert pool.acquire(verbose=False) is driver
+    assert len(launches) == 1
+    assert viewport_overrides(driver) == []
+
+
+def test_acquire_launches_when_idle_queue_empty(launches):
+    pool = BrowserPool(pool_size=1)
+    first = pool.acquire(verbose=False)
+    second = pool.acquire(verbose=False)
+    assert first is not second
+    assert len(launches) == 2
+
+
+def test_acquire_sets_viewport_when_size_differs(launches):
+    pool = BrowserPool(pool_size=1)
+    driver = pool.acquire(window_width=1920, window_height=1080, verbose=False)
+    pool.release(driver)
+    assert pool.acquire(window_width=800, window_height=600, verbose=False) is driver
+    assert [(v["width"], v["height"]) for v in viewport_overrides(driver)] == [(800, 600)]
+
+
+def test_release_discards_when_pool_full(launches):
+    pool = BrowserPool(pool_size=1)
+    first = pool.acquire(verbose=False)
+    second = pool.acquire(verbose=False)
+    pool.release(first)
+    pool.release(second)
+    assert not first.quit_called
+    assert second.quit_called
+
+
+def test_release_recycles_after_limit(launches):
+    pool = BrowserPool(pool_size=1, recycle_after=2)
+    driver = pool.acquire(verbose=False)
+    pool.release(driver)
+    assert pool.acquire(verbose=False) is driver
+    pool.release(driver)
+    assert driver.quit_called
+    assert pool.acquire(verbose=False) is not driver
+
+
+def test_release_resets_tabs_and_storage(launches):
+    pool = BrowserPool(pool_size=1)
+    driver = pool.acquire(verbose=False)
+    driver.execute_script("window.open('about:blank', '_blank')")
+    driver.origins = {"tab-0": ["https://a.example", "https://ads.example"],
+                      "tab-1": ["https://b.example"]}
+    pool.release(driver)
+    assert driver.window_handles == ["tab-0"]
+    assert driver.visited == ["about:blank"]
+    cleared = {params["origin"] for cmd, params in driver.cdp_calls
+               if cmd == "Storage.clearDataForOrigin"}
+    assert cleared == {"https://a.example", "https://ads.example", "https://b.example"}
+    assert "Network.clearBrowserCookies" in driver.cdp_commands()
+
+
+def test_discard_clears_bookkeeping(launches, monkeypatch, tmp_path):
+    monkeypatch.setattr(pool_module, "CACHE_DIR", str(tmp_path))
+    pool = BrowserPool(pool_size=1)
+    driver = pool.acquire(verbose=False)
+    key = id(driver)
+    assert key in pool._keys and key in pool._uses
+    assert key in pool._sizes and key in pool._cache_slots
+    pool.discard(driver)
+    assert driver.quit_called
+    for table in (pool._keys, pool._uses, pool._sizes, pool._cache_slots):
+        assert key not in table
+
+
+def test_concurrent_launches_get_distinct_cache_slots(monkeypatch, tmp_path):
+    monkeypatch.setattr(pool_module, "CACHE_DIR", str(tmp_path))
+    barrier = threading.Barrier(2, timeout=5)
+    launched = []
+
+    def setup_driver(headless, window_width, window_height, verbose,
+                     page_load_timeout, disk_cache_dir=None):
+        # 两个浏览器都进入启动阶段后才返回，确保分配缓存目录时彼此重叠
+        launched.append(disk_cache_dir)
+        barrier.wait()
+        return FakeDriver()
+
+    monkeypatch.setattr(pool_module, "setup_driver", setup_driver)
+    pool = BrowserPool(pool_size=2)
+    drivers = []
+    threads = [threading.Thread(target=lambda: drivers.append(pool.acquire(verbose=False)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(drivers) == 2
+    assert sorted(launched) == [str(tmp_path / "slot-0"), str(tmp_path / "slot-1")]
+
+    # 关闭一个浏览器后，其目录可分配给下一个新启动的浏览器
+    freed = pool._cache_slots[id(drivers[0])]
+    pool.discard(drivers[0])
+    barrier = threading.Barrier(1)
+    pool.acquire(verbose=False)
+    assert launched[-1] == str(tmp_path / f"slot-{freed}")
+
+
+@pytest.mark.parametrize("value", ["0", "-3"])
+def test_pool_size_from_env_clamps_to_one(monkeypatch, value):
+    monkeypatch.setenv("WEBSHOT_POOL_SIZE", value)
+    assert pool_module._pool_size_from_env() == 1
+
+
+def test_pool_size_from_env_rejects_non_integer(monkeypatch):
+    monkeypatch.setenv("WEBSHOT_POOL_SIZE", "many")
+    with pytest.raises(ValueError, match="WEBSHOT_POOL_SIZE"):
+        pool_module._pool_size_from_env()
+
+
+def test_pool_rejects_non_positive_size():
+    with pytest.raises(ValueError):
+        BrowserPool(pool_size=0)
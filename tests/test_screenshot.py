@@ -0,0 +1,32 @@
+"""
+screenshot 模块中等待逻辑的测试
+"""
+
+from selenium.common.exceptions import JavascriptException
+
+from webpage_screenshot.screenshot import wait_for_page_loaded
+
+
+def unload_then_idle(driver, failures):
+    calls = []
+
+    def execute_async_script(script, *args):
+        calls.append(args)
+        if len(calls) <= failures:
+            raise JavascriptException("document unloaded while waiting for result")
+        return True
+
+    driver.execute_async_script = execute_async_script
+    return calls
+
+
+def test_wait_for_page_loaded_retries_after_redirect(fake_driver):
+    calls = unload_then_idle(fake_driver, failures=1)
+    assert wait_for_page_loaded(fake_driver, timeout=5) is True
+    assert len(calls) == 2
+
+
+def test_wait_for_page_loaded_retries_only_once(fake_driver):
+    calls = unload_then_idle(fake_driver, failures=2)
+    assert wait_for_page_loaded(fake_driver, timeout=5) is True
+    assert len(calls) == 2
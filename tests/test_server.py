@@ -0,0 +1,121 @@
+"""
+server 模块的冒烟测试：使用假的浏览器池和 WebDriver 走完截图流程
+"""
+
+import asyncio
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+from webpage_screenshot import server
+from webpage_screenshot.screenshot import DEFAULT_BLOCKLIST
+from webpage_screenshot.server import ScreenshotParams
+
+
+class FakePool:
+    def __init__(self, driver):
+        self.driver = driver
+        self.released = []
+        self.discarded = []
+
+    def acquire(self, **kwargs):
+        return self.driver
+
+    def release(self, driver):
+        self.released.append(driver)
+
+    def discard(self, driver):
+        self.discarded.append(driver)
+
+
+@pytest.fixture
+def pool(fake_driver, monkeypatch):
+    pool = FakePool(fake_driver)
+    monkeypatch.setattr(server, "get_pool", lambda: pool)
+    return pool
+
+
+def blocked_urls(driver):
+    return [params["urls"] for cmd, params in driver.cdp_calls if cmd == "Network.setBlockedURLs"]
+
+
+def capture_formats(driver):
+    return [params["format"] for cmd, params in driver.cdp_calls if cmd == "Page.captureScreenshot"]
+
+
+def test_screenshot_params_fields():
+    params = ScreenshotParams.model_validate({"url": "https://example.com",
+                                              "block_patterns": ["*.gif"]})
+    assert params.block_patterns == ["*.gif"]
+    assert ScreenshotParams(url="https://example.com").block_patterns is None
+
+
+def test_screenshot_params_rejects_invalid_quality():
+    with pytest.raises(ValueError):
+        ScreenshotParams(url="https://example.com", quality=101)
+
+
+def test_do_screenshot_binary(pool, fake_driver):
+    params = ScreenshotParams(url="https://example.com", block_patterns=["*.gif"])
+    assert server._do_screenshot(params) == b"image"
+    assert fake_driver.visited == ["https://example.com"]
+    assert blocked_urls(fake_driver) == [["*.gif"]]
+    assert capture_formats(fake_driver) == ["png"]
+    assert pool.released == [fake_driver]
+
+
+def test_do_screenshot_base64_infers_format_from_output_path(pool, fake_driver, tmp_path):
+    output = tmp_path / "out.jpg"
+    params = ScreenshotParams(url="https://example.com", output_path=str(output),
+                              return_format="base64")
+    assert server._do_screenshot(params) == base64.b64encode(b"image").decode()
+    assert output.read_bytes() == b"image"
+    assert blocked_urls(fake_driver) == [list(DEFAULT_BLOCKLIST)]
+    assert capture_formats(fake_driver) == ["jpeg"]
+
+
+def test_do_screenshot_discards_driver_on_error(pool, fake_driver, monkeypatch):
+    def fail(url):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(fake_driver, "get", fail)
+    with pytest.raises(RuntimeError):
+        server._do_screenshot(ScreenshotParams(url="https://example.com"))
+    assert pool.discarded == [fake_driver]
+    assert pool.released == []
+
+
+def test_do_batch_opens_one_tab_per_item(pool, fake_driver):
+    items = [ScreenshotParams(url="https://a.example"),
+             ScreenshotParams(url="https://b.example", format="webp", block_patterns=[])]
+    images, errors = server._do_batch(items)
+    assert images == [base64.b64encode(b"image").decode()] * 2
+    assert errors == [None, None]
+    assert fake_driver.visited == ["https://a.example", "https://b.example"]
+    assert blocked_urls(fake_driver) == [list(DEFAULT_BLOCKLIST), []]
+    assert capture_formats(fake_driver) == ["png", "webp"]
+    assert pool.released == [fake_driver]
+
+
+def test_do_batch_reports_per_item_errors(pool, fake_driver, monkeypatch):
+    def wait_for_page(driver, wait_time, auto_wait):
+        if driver.current_window_handle == "tab-1":
+            raise RuntimeError("document unloaded")
+
+    monkeypatch.setattr(server, "wait_for_page", wait_for_page)
+    items = [ScreenshotParams(url="https://a.example"), ScreenshotParams(url="https://b.example")]
+    images, errors = server._do_batch(items)
+    assert images == [None, base64.b64encode(b"image").decode()]
+    assert errors == ["document unloaded", None]
+    assert pool.released == [fake_driver]
+    assert pool.discarded == []
+
+
+def test_screenshot_batch_rejects_oversized_batch(pool, monkeypatch):
+    monkeypatch.setattr(server, "BATCH_MAX_SIZE", 2)
+    items = [ScreenshotParams(url=f"https://{i}.example") for i in range(3)]
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.screenshot_batch(items))
+    assert excinfo.value.status_code == 422
+    assert pool.driver.visited == []
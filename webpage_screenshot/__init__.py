@@ -2,9 +2,29 @@
 网页截图工具 - 使用 Selenium 访问网页并保存为图片
 """
 
-from webpage_screenshot.screenshot import take_screenshot, wait_for_page_loaded, wait_for_images_loaded
-from webpage_screenshot.cli import main
-from webpage_screenshot.server import app, run_server
+import importlib
 
 __version__ = "1.0.0"
 __all__ = ["take_screenshot", "main", "wait_for_page_loaded", "wait_for_images_loaded", "app", "run_server"]
+
+# 按需加载：导入包本身不会拉起 Selenium / FastAPI，首次访问对应属性时才导入
+_LAZY = {
+    "take_screenshot": "webpage_screenshot.screenshot",
+    "wait_for_page_loaded": "webpage_screenshot.screenshot",
+    "wait_for_images_loaded": "webpage_screenshot.screenshot",
+    "main": "webpage_screenshot.cli",
+    "app": "webpage_screenshot.server",
+    "run_server": "webpage_screenshot.server",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
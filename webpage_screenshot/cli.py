@@ -3,11 +3,24 @@
 """
 
 import argparse
+import functools
 import sys
 
 
+def _quality(value: str) -> int:
+    """解析 --quality 参数，要求为 0-100 的整数"""
+    try:
+        quality = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的整数：{value}")
+    if not 0 <= quality <= 100:
+        raise argparse.ArgumentTypeError(f"图片质量必须在 0-100 之间：{value}")
+    return quality
+
+
+@functools.lru_cache(maxsize=1)
 def create_parser() -> argparse.ArgumentParser:
-    """创建并返回命令行参数解析器"""
+    """创建并返回命令行参数解析器（进程内只构建一次，parse_args 不会修改解析器）"""
     parser = argparse.ArgumentParser(
         prog="webpage-screenshot",
         description="网页截图工具 - 使用 Selenium 访问网页并保存为图片",
@@ -30,15 +43,23 @@ def create_parser() -> argparse.ArgumentParser:
     parser.add_argument("--no-full-page", action="store_false", dest="full_page",
                         help="仅截取当前视口")
     parser.add_argument("--wait", type=int, default=2,
-                        help="等待时间（秒），auto_wait 模式下为最大等待时间 (默认：2)")
+                        help="最大等待时间（秒） (默认：2)")
     parser.add_argument("--no-auto-wait", action="store_false", dest="auto_wait",
-                        help="禁用自动等待，使用固定等待时间")
+                        help="禁用自动等待，仅等待网络短暂空闲（最长 --wait 秒）")
     parser.add_argument("--width", type=int, default=1920,
                         help="浏览器窗口宽度（默认：1920）")
     parser.add_argument("--height", type=int, default=1080,
                         help="浏览器窗口高度（默认：1080）")
     parser.add_argument("--visible", action="store_true",
                         help="显示浏览器窗口（非无头模式）")
+    parser.add_argument("--format", choices=["png", "jpeg", "webp"], dest="image_format",
+                        help="图片格式（默认：根据输出文件扩展名推断，否则为 png）")
+    parser.add_argument("--quality", type=_quality, default=80,
+                        help="jpeg / webp 图片质量 0-100（默认：80）")
+    parser.add_argument("--block", action="append", metavar="PATTERN",
+                        help="额外屏蔽的请求 URL 模式，支持 * 通配符，可多次指定")
+    parser.add_argument("--no-default-block", action="store_true",
+                        help="不屏蔽默认的广告、统计和视频请求")
     parser.add_argument("-q", "--quiet", action="store_true",
                         help="安静模式，不输出详细信息")
 
@@ -47,7 +68,7 @@ def create_parser() -> argparse.ArgumentParser:
 
 def main():
     """命令行入口函数"""
-    from webpage_screenshot.screenshot import take_screenshot
+    from webpage_screenshot.screenshot import take_screenshot, DEFAULT_BLOCKLIST
 
     parser = create_parser()
     args = parser.parse_args()
@@ -58,6 +79,11 @@ def main():
         if not args.quiet:
             print(f"自动添加协议前缀：{url}", file=sys.stderr)
 
+    block_patterns = None
+    if args.block or args.no_default_block:
+        block_patterns = [] if args.no_default_block else list(DEFAULT_BLOCKLIST)
+        block_patterns += args.block or []
+
     success = take_screenshot(
         url=url,
         output_path=args.output,
@@ -67,7 +93,10 @@ def main():
         auto_wait=args.auto_wait,
         window_width=args.width,
         window_height=args.height,
-        verbose=not args.quiet
+        verbose=not args.quiet,
+        block_patterns=block_patterns,
+        image_format=args.image_format,
+        quality=args.quality
     )
 
     sys.exit(0 if success else 1)
@@ -0,0 +1,223 @@
+"""
+浏览器池模块 - 复用已启动的 Chrome WebDriver，避免每次截图都冷启动浏览器
+"""
+
+import atexit
+import os
+import queue
+import sys
+import threading
+
+from webpage_screenshot.screenshot import setup_driver, set_viewport_size
+
+
+def _pool_size_from_env() -> int:
+    """读取 WEBSHOT_POOL_SIZE，非整数时报错，小于 1 时按 1 处理"""
+    value = os.environ.get("WEBSHOT_POOL_SIZE", "2")
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError(f"WEBSHOT_POOL_SIZE 必须是正整数：{value!r}") from None
+    if size < 1:
+        print(f"WEBSHOT_POOL_SIZE={value} 无效，至少为 1，已按 1 处理", file=sys.stderr)
+        size = 1
+    return size
+
+
+# 有头/无头模式各自最多保留的空闲浏览器数量（至少为 1），也是 API 服务的并发截图数
+POOL_SIZE = _pool_size_from_env()
+
+# 持久化磁盘缓存根目录；每个浏览器独占其下的一个 slot-N 子目录（默认不启用）
+CACHE_DIR = os.environ.get("WEBSHOT_CACHE_DIR")
+
+# 单个浏览器最多使用的次数，达到后关闭重建，避免长期运行的 Chrome 内存持续增长（0 表示不限制）
+RECYCLE_AFTER = int(os.environ.get("WEBSHOT_POOL_RECYCLE_AFTER", "100"))
+
+
+class BrowserPool:
+    """
+    按 headless 分组的 WebDriver 池
+
+    空闲浏览器不区分窗口尺寸：复用时若请求的尺寸与启动尺寸不同，通过
+    Emulation.setDeviceMetricsOverride 设置视口，因此空闲浏览器总数不超过
+    2 * pool_size，与请求中出现多少种尺寸无关。
+
+    acquire() 优先取出空闲的浏览器，没有时新建一个；release() 将浏览器
+    重置为空白页、清空 Cookie 和已访问源的存储并清除视口尺寸覆盖后放回
+    池中，池已满、重置失败或使用次数达到 recycle_after 时直接关闭。
+
+    隔离范围：Cookie 在整个浏览器范围内清空；localStorage、IndexedDB 等存储
+    只清除释放时各标签页中仍存在的框架（含 iframe）所属的源。重定向链上途经、
+    或已被移除的 iframe 的源的存储会保留到下一次使用，需要完全隔离时将
+    recycle_after 设为 1（即每次用后关闭浏览器）。
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, recycle_after: int = RECYCLE_AFTER):
+        if pool_size < 1:
+            raise ValueError(f"pool_size 至少为 1：{pool_size}")
+        self.pool_size = pool_size
+        self.recycle_after = recycle_after
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._keys = {}
+        self._uses = {}
+        self._sizes = {}
+        self._cache_slots = {}
+
+    def _queue(self, key) -> queue.Queue:
+        with self._lock:
+            if key not in self._idle:
+                self._idle[key] = queue.Queue(maxsize=self.pool_size)
+            return self._idle[key]
+
+    def _claim_cache_slot(self):
+        """
+        为新启动的浏览器分配一个未被占用的缓存子目录
+
+        Chrome 的磁盘缓存假定由单个进程独占，因此每个存活的浏览器使用
+        CACHE_DIR 下独立的 slot-N 目录；浏览器关闭后该目录可被后续浏览器复用。
+        未设置 CACHE_DIR 时返回 (None, None)。
+        """
+        if not CACHE_DIR:
+            return None, None
+        with self._lock:
+            in_use = set(self._cache_slots.values())
+            index = 0
+            while index in in_use:
+                index += 1
+            # 启动期间先以占位键登记，避免并发启动的浏览器拿到同一目录
+            slot = ("starting", index)
+            self._cache_slots[slot] = index
+        return slot, os.path.join(CACHE_DIR, f"slot-{index}")
+
+    def acquire(self, headless: bool = True, window_width: int = 1920,
+                window_height: int = 1080, verbose: bool = True,
+                page_load_timeout: int = 60):
+        """
+        取出一个 WebDriver
+
+        参数:
+            headless: 是否使用无头模式
+            window_width: 窗口宽度
+            window_height: 窗口高度
+            verbose: 是否显示详细信息
+            page_load_timeout: 页面加载超时时间（秒）
+
+        返回:
+            Chrome WebDriver 实例，用完后需调用 release() 或 discard()
+        """
+        key = headless
+        try:
+            driver = self._queue(key).get_nowait()
+            if verbose:
+                print("复用已启动的浏览器", file=sys.stderr)
+        except queue.Empty:
+            slot, cache_dir = self._claim_cache_slot()
+            try:
+                driver = setup_driver(headless, window_width, window_height, verbose,
+                                      page_load_timeout, disk_cache_dir=cache_dir)
+            except Exception:
+                with self._lock:
+                    self._cache_slots.pop(slot, None)
+                raise
+            with self._lock:
+                self._sizes[id(driver)] = (window_width, window_height)
+                if slot is not None:
+                    self._cache_slots[id(driver)] = self._cache_slots.pop(slot)
+        else:
+            try:
+                driver.set_page_load_timeout(page_load_timeout)
+                if self._sizes.get(id(driver)) != (window_width, window_height):
+                    set_viewport_size(driver, window_width, window_height)
+            except Exception:
+                self.discard(driver)
+                raise
+
+        with self._lock:
+            self._keys[id(driver)] = key
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+        return driver
+
+    def release(self, driver) -> None:
+        """重置浏览器状态并放回池中"""
+        with self._lock:
+            key = self._keys.pop(id(driver), None)
+            uses = self._uses.get(id(driver), 0)
+        idle = self._queue(key) if key is not None else None
+        if idle is None or idle.full() or 0 < self.recycle_after <= uses:
+            self.discard(driver)
+            return
+
+        try:
+            # 记录各标签页中所有框架（含 iframe）的源，随后关闭批量截图时打开的多余标签页
+            origins = set()
+            handles = driver.window_handles
+            for index, handle in enumerate(handles):
+                driver.switch_to.window(handle)
+                tree = driver.execute_cdp_cmd("Page.getFrameTree", {})["frameTree"]
+                origins.update(_frame_origins(tree))
+                if index > 0:
+                    driver.close()
+            driver.switch_to.window(handles[0])
+            driver.get("about:blank")
+            # delete_all_cookies 只作用于当前文档（about:blank），需通过 CDP 清空整个浏览器的 Cookie
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in origins:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                    "origin": origin,
+                    "storageTypes": "all"
+                })
+            driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+            idle.put_nowait(driver)
+        except Exception:
+            self.discard(driver)
+
+    def discard(self, driver) -> None:
+        """关闭浏览器，不再放回池中（用于出错后状态未知的实例）"""
+        with self._lock:
+            self._keys.pop(id(driver), None)
+            self._uses.pop(id(driver), None)
+            self._sizes.pop(id(driver), None)
+            self._cache_slots.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        """关闭池中所有空闲浏览器"""
+        with self._lock:
+            queues = list(self._idle.values())
+            self._idle.clear()
+        for q in queues:
+            while True:
+                try:
+                    driver = q.get_nowait()
+                except queue.Empty:
+                    break
+                self.discard(driver)
+
+
+def _frame_origins(tree) -> set:
+    """返回 Page.getFrameTree 结果中所有 http(s) 框架的源"""
+    origins = set()
+    origin = tree["frame"].get("securityOrigin", "")
+    if origin.startswith("http"):
+        origins.add(origin)
+    for child in tree.get("childFrames", ()):
+        origins.update(_frame_origins(child))
+    return origins
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> BrowserPool:
+    """返回进程内共享的浏览器池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -3,31 +3,142 @@
 """
 
 import os
-import time
+import functools
 import base64
 import sys
+import time
 from pathlib import Path
+from typing import Optional, Sequence
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.support.ui import WebDriverWait
 
+# 默认屏蔽的请求（广告、统计脚本和视频），不影响页面主体渲染
+DEFAULT_BLOCKLIST = (
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*google-analytics.com*",
+    "*hm.baidu.com*",
+    "*cnzz.com*",
+    "*.mp4*",
+    "*.webm*",
+)
+
+# 输出文件扩展名与截图格式的对应关系
+IMAGE_FORMATS = {
+    ".png": "png",
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".webp": "webp",
+}
+
+# 启用持久化磁盘缓存时 Chrome 磁盘缓存的上限（字节）
+DISK_CACHE_SIZE = 256 * 1024 * 1024
+
+# 请求计数脚本：在每个文档的页面脚本之前注入，统计进行中的 fetch / XHR 数量
+_REQUEST_TRACKER_SCRIPT = """
+(function () {
+    if (window.__webshotInflight !== undefined) {
+        return;
+    }
+    window.__webshotInflight = 0;
+    function finished() {
+        window.__webshotInflight--;
+    }
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            window.__webshotInflight++;
+            try {
+                return originalFetch.apply(this, arguments).finally(finished);
+            } catch (e) {
+                finished();
+                throw e;
+            }
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        window.__webshotInflight++;
+        this.addEventListener('loadend', finished, {once: true});
+        try {
+            return originalSend.apply(this, arguments);
+        } catch (e) {
+            this.removeEventListener('loadend', finished);
+            finished();
+            throw e;
+        }
+    };
+})();
+"""
+
+# 网络空闲检测脚本：load 事件之后在页面内检查，整个等待只需一次 WebDriver 调用。
+# 进行中的 fetch / XHR 由 _REQUEST_TRACKER_SCRIPT 计数；图片、脚本等其他子资源
+# 只有在完成时才能通过 PerformanceObserver 观察到。
+_NETWORK_IDLE_SCRIPT = """
+var idleMs = arguments[0];
+var done = arguments[arguments.length - 1];
+function watch() {
+    var lastActivity = performance.now();
+    var observer = new PerformanceObserver(function () {
+        lastActivity = performance.now();
+    });
+    observer.observe({type: 'resource'});
+    var timer = setInterval(function () {
+        if ((window.__webshotInflight || 0) > 0) {
+            lastActivity = performance.now();
+        } else if (performance.now() - lastActivity >= idleMs) {
+            clearInterval(timer);
+            observer.disconnect();
+            done(true);
+        }
+    }, 50);
+}
+if (document.readyState === 'complete') {
+    watch();
+} else {
+    window.addEventListener('load', watch, {once: true});
+}
+"""
 
+
+# 每次启动 Chrome 都使用的固定参数
+BASE_CHROME_ARGS = (
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-blink-features=AutomationControlled",
+    "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+)
+
+# Chrome 浏览器标准安装路径
+CHROME_BINARY_PATHS = (
+    # Docker/Linux
+    "/usr/bin/google-chrome",
+    "/usr/bin/google-chrome-stable",
+    "/usr/bin/chromium",
+    "/usr/bin/chromium-browser",
+    # macOS
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    "/Applications/Google Chrome for Testing.app/Contents/MacOS/Google Chrome",
+    # Windows
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+)
+
+# ChromeDriver 标准安装路径
+CHROMEDRIVER_PATHS = (
+    "/usr/bin/chromedriver",
+    "/usr/local/bin/chromedriver",
+)
+
+
+@functools.lru_cache(maxsize=1)
 def find_chrome_binary():
-    """查找 Chrome 浏览器路径"""
-    paths_to_check = [
-        # Docker/Linux
-        "/usr/bin/google-chrome",
-        "/usr/bin/google-chrome-stable",
-        "/usr/bin/chromium",
-        "/usr/bin/chromium-browser",
-        # macOS
-        "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
-        "/Applications/Google Chrome for Testing.app/Contents/MacOS/Google Chrome",
-        # Windows
-        r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-        r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
-    ]
-    for path in paths_to_check:
+    """查找 Chrome 浏览器路径（结果在进程内缓存）"""
+    for path in CHROME_BINARY_PATHS:
         if os.path.exists(path):
             return path
     # 检查环境变量
@@ -37,13 +148,10 @@ def find_chrome_binary():
     return None
 
 
+@functools.lru_cache(maxsize=1)
 def find_chromedriver():
-    """查找 ChromeDriver 路径"""
-    paths_to_check = [
-        "/usr/bin/chromedriver",
-        "/usr/local/bin/chromedriver",
-    ]
-    for path in paths_to_check:
+    """查找 ChromeDriver 路径（结果在进程内缓存）"""
+    for path in CHROMEDRIVER_PATHS:
         if os.path.exists(path):
             return path
     # 检查环境变量
@@ -55,7 +163,8 @@ def find_chromedriver():
 
 def setup_driver(headless: bool = True, window_width: int = 1920,
                  window_height: int = 1080, verbose: bool = True,
-                 page_load_timeout: int = 60) -> webdriver.Chrome:
+                 page_load_timeout: int = 60,
+                 disk_cache_dir: Optional[str] = None) -> webdriver.Chrome:
     """
     配置并返回 Chrome WebDriver
 
@@ -65,23 +174,25 @@ def setup_driver(headless: bool = True, window_width: int = 1920,
         window_height: 窗口高度
         verbose: 是否显示详细信息
         page_load_timeout: 页面加载超时时间（秒），默认 60 秒
+        disk_cache_dir: 持久化磁盘缓存目录，同一时间只能由一个 Chrome 进程使用
 
     返回:
         Chrome WebDriver 实例
     """
-    from selenium.webdriver.chrome.service import Service
-
     chrome_options = Options()
 
     if headless:
         chrome_options.add_argument("--headless=new")
 
     chrome_options.add_argument(f"--window-size={window_width},{window_height}")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    for argument in BASE_CHROME_ARGS:
+        chrome_options.add_argument(argument)
+
+    # 可选的持久化磁盘缓存：重复截图同一站点时复用已下载的 CSS/JS/图片
+    if disk_cache_dir:
+        os.makedirs(disk_cache_dir, exist_ok=True)
+        chrome_options.add_argument(f"--disk-cache-dir={disk_cache_dir}")
+        chrome_options.add_argument(f"--disk-cache-size={DISK_CACHE_SIZE}")
 
     chrome_binary = find_chrome_binary()
     if chrome_binary:
@@ -98,9 +209,68 @@ def setup_driver(headless: bool = True, window_width: int = 1920,
         driver = webdriver.Chrome(options=chrome_options)
 
     driver.set_page_load_timeout(page_load_timeout)
+    track_requests(driver)
     return driver
 
 
+def track_requests(driver) -> None:
+    """
+    在当前标签页注入请求计数脚本，此后加载的每个文档都会统计进行中的 fetch / XHR，
+    供 wait_for_network_idle 判断网络空闲。需在导航之前调用，每个标签页调用一次。
+    """
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+        "source": _REQUEST_TRACKER_SCRIPT
+    })
+
+
+def set_viewport_size(driver, width: int, height: int) -> None:
+    """通过 CDP 设置当前标签页的视口尺寸（只改变渲染尺寸，不调整浏览器窗口）"""
+    driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+        "width": width,
+        "height": height,
+        "deviceScaleFactor": 1,
+        "mobile": False
+    })
+
+
+def block_urls(driver, patterns: Optional[Sequence[str]] = None) -> None:
+    """
+    屏蔽当前标签页中匹配的请求，需在导航之前调用
+
+    参数:
+        driver: WebDriver 实例
+        patterns: URL 匹配模式（支持 * 通配符），为 None 时使用 DEFAULT_BLOCKLIST，
+            传入空列表则不屏蔽任何请求
+    """
+    if patterns is None:
+        patterns = DEFAULT_BLOCKLIST
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+
+
+def wait_for_network_idle(driver, max_wait: float, idle_ms: int = 200) -> bool:
+    """
+    等待网络空闲：load 事件之后，没有进行中的 fetch / XHR，且连续 idle_ms 毫秒没有新资源完成
+
+    进行中的 fetch / XHR 只有在标签页已调用 track_requests() 时才会被计入
+    （setup_driver 创建的标签页默认已注入）；图片、脚本等其他子资源以完成事件为准。
+
+    参数:
+        driver: WebDriver 实例
+        max_wait: 最长等待时间（秒）
+        idle_ms: 网络空闲判定阈值（毫秒）
+
+    返回:
+        bool: 是否在 max_wait 内达到空闲
+    """
+    driver.set_script_timeout(max_wait)
+    try:
+        driver.execute_async_script(_NETWORK_IDLE_SCRIPT, idle_ms)
+        return True
+    except TimeoutException:
+        return False
+
+
 def wait_for_page_loaded(driver, timeout: int = 30, verbose: bool = False) -> bool:
     """
     等待页面完全加载（包括动态资源和网络空闲）
@@ -113,39 +283,23 @@ def wait_for_page_loaded(driver, timeout: int = 30, verbose: bool = False) -> bo
     返回:
         bool: 是否成功等待完成
     """
+    deadline = time.monotonic() + timeout
     try:
-        # 等待 document.readyState 完成
-        WebDriverWait(driver, timeout).until(
-            lambda d: d.execute_script("return document.readyState") == "complete"
-        )
-
-        # 等待网络空闲：检查页面资源是否仍在加载
-        start_time = time.time()
-        idle_threshold = 0.5  # 网络空闲判定阈值（秒）
-        idle_start = None
-
-        while time.time() - start_time < timeout:
-            # 检查页面是否有正在加载的资源
-            loading = driver.execute_script("""
-                return document.readyState !== 'complete' ||
-                       window.performance?.getEntriesByType('resource')?.filter(
-                           r => r.transferSize === undefined || r.duration > 0
-                       ).length > 0;
-            """)
-
-            if not loading:
-                if idle_start is None:
-                    idle_start = time.time()
-                elif time.time() - idle_start >= idle_threshold:
-                    if verbose:
-                        print("页面资源加载完成", file=sys.stderr)
-                    return True
-            else:
-                idle_start = None
-
-            time.sleep(0.1)
-
-        if verbose:
+        try:
+            idle = wait_for_network_idle(driver, timeout, idle_ms=500)
+        except WebDriverException as e:
+            # 页面在等待期间跳转（JS 重定向、meta refresh）时原文档被卸载，
+            # 在剩余时间内对新文档再等待一次
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise
+            if verbose:
+                print(f"页面已跳转，继续等待新页面：{e}", file=sys.stderr)
+            idle = wait_for_network_idle(driver, remaining, idle_ms=500)
+        if idle:
+            if verbose:
+                print("页面资源加载完成", file=sys.stderr)
+        elif verbose:
             print("等待超时，继续执行", file=sys.stderr)
         return True
 
@@ -168,18 +322,20 @@ def wait_for_images_loaded(driver, timeout: int = 10, verbose: bool = False) ->
         bool: 是否所有图片加载完成
     """
     try:
-        WebDriverWait(driver, timeout).until(
-            lambda d: d.execute_script("""
-                var images = document.getElementsByTagName('img');
-                for (var i = 0; i < images.length; i++) {
-                    if (images[i].complete === false ||
-                        images[i].naturalHeight === 0) {
-                        return false;
-                    }
+        # 一次调用等待全部图片：已完成的直接跳过，其余等待 load/error 事件
+        driver.set_script_timeout(timeout)
+        driver.execute_async_script("""
+            var done = arguments[arguments.length - 1];
+            Promise.all(Array.from(document.images).map(function (img) {
+                if (img.complete) {
+                    return null;
                 }
-                return true;
-            """)
-        )
+                return new Promise(function (resolve) {
+                    img.addEventListener('load', resolve, {once: true});
+                    img.addEventListener('error', resolve, {once: true});
+                });
+            })).then(function () { done(true); });
+        """)
         if verbose:
             print("图片加载完成", file=sys.stderr)
         return True
@@ -189,11 +345,97 @@ def wait_for_images_loaded(driver, timeout: int = 10, verbose: bool = False) ->
         return True
 
 
+def wait_for_page(driver, wait_time: int = 3, auto_wait: bool = True,
+                  verbose: bool = False) -> None:
+    """
+    等待当前标签页加载完成
+
+    参数:
+        driver: WebDriver 实例
+        wait_time: 最大等待时间（秒）
+        auto_wait: 是否自动等待页面资源加载完成
+        verbose: 是否显示详细信息
+    """
+    if auto_wait:
+        # 智能等待模式
+        wait_for_page_loaded(driver, timeout=wait_time * 10, verbose=verbose)
+        wait_for_images_loaded(driver, timeout=wait_time, verbose=verbose)
+    else:
+        # 简单等待模式：文档加载完成后等待网络短暂空闲，最多 wait_time 秒
+        WebDriverWait(driver, wait_time).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+        try:
+            wait_for_network_idle(driver, wait_time)
+        except WebDriverException as e:
+            # 页面在等待期间跳转或卸载（JS 重定向、meta refresh）时继续截图
+            if verbose:
+                print(f"等待网络空闲时出错：{e}", file=sys.stderr)
+
+
+def guess_image_format(output_path: str) -> str:
+    """根据输出文件扩展名推断图片格式，无法识别时使用 png"""
+    return IMAGE_FORMATS.get(Path(output_path).suffix.lower(), "png")
+
+
+def capture_page(driver, full_page: bool = True, image_format: str = "png",
+                 quality: int = 80) -> str:
+    """
+    截取当前标签页
+
+    参数:
+        driver: WebDriver 实例
+        full_page: 是否截取完整页面
+        image_format: 图片格式，png / jpeg / webp
+        quality: 图片质量（0-100），仅对 jpeg / webp 生效
+
+    返回:
+        str: base64 编码的图片数据
+    """
+    params = {
+        "format": image_format,
+        "captureBeyondViewport": False,
+        "fromSurface": True
+    }
+    if image_format != "png":
+        params["quality"] = quality
+    if full_page:
+        # 一次 CDP 调用取得页面尺寸，通过 clip 直接截取视口之外的区域，无需调整窗口大小
+        metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+        content = metrics.get("cssContentSize") or metrics["contentSize"]
+        viewport = metrics.get("cssLayoutViewport") or metrics["layoutViewport"]
+        # 页面没有超出视口时按普通视口截图，省去视口外的额外渲染
+        if content["width"] > viewport["clientWidth"] or content["height"] > viewport["clientHeight"]:
+            params["captureBeyondViewport"] = True
+            params["clip"] = {
+                "x": 0,
+                "y": 0,
+                "width": max(content["width"], viewport["clientWidth"]),
+                "height": max(content["height"], viewport["clientHeight"]),
+                "scale": 1
+            }
+
+    result = driver.execute_cdp_cmd("Page.captureScreenshot", params)
+    return result['data']
+
+
+def save_image(image_data: bytes, output_path: str) -> Path:
+    """将图片数据写入文件（自动创建父目录），返回输出路径"""
+    output_file = Path(output_path)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'wb') as f:
+        f.write(image_data)
+    return output_file
+
+
 def take_screenshot(url: str, output_path: str = "screenshot.png",
                     headless: bool = True, full_page: bool = True,
                     wait_time: int = 3, auto_wait: bool = True,
                     window_width: int = 1920, window_height: int = 1080,
-                    verbose: bool = True) -> bool:
+                    verbose: bool = True,
+                    block_patterns: Optional[Sequence[str]] = None,
+                    image_format: Optional[str] = None,
+                    quality: int = 80) -> bool:
     """
     访问网页并保存为图片
 
@@ -202,52 +444,36 @@ def take_screenshot(url: str, output_path: str = "screenshot.png",
         output_path: 输出图片路径
         headless: 是否使用无头模式
         full_page: 是否截取完整页面
-        wait_time: 等待时间（秒），auto_wait=True 时作为最大等待时间
+        wait_time: 最大等待时间（秒）
         auto_wait: 是否自动等待页面资源加载完成
         window_width: 窗口宽度
         window_height: 窗口高度
         verbose: 是否显示详细信息
+        block_patterns: 屏蔽的请求 URL 模式，为 None 时使用 DEFAULT_BLOCKLIST
+        image_format: 图片格式，png / jpeg / webp，为 None 时根据 output_path 扩展名推断
+        quality: 图片质量（0-100），仅对 jpeg / webp 生效
 
     返回:
         bool: 操作是否成功
     """
-    import sys
+    # pool 模块依赖本模块的 setup_driver，此处延迟导入以避免循环导入
+    from webpage_screenshot.pool import get_pool
+
+    pool = get_pool()
     driver = None
     try:
         if verbose:
             print(f"正在访问：{url}", file=sys.stderr)
 
-        driver = setup_driver(headless, window_width, window_height, verbose)
+        driver = pool.acquire(headless, window_width, window_height, verbose)
+        block_urls(driver, block_patterns)
         driver.get(url)
+        wait_for_page(driver, wait_time, auto_wait, verbose)
+        if image_format is None:
+            image_format = guess_image_format(output_path)
+        image_data = base64.b64decode(capture_page(driver, full_page, image_format, quality))
 
-        if auto_wait:
-            # 智能等待模式
-            wait_for_page_loaded(driver, timeout=wait_time * 10, verbose=verbose)
-            wait_for_images_loaded(driver, timeout=wait_time, verbose=verbose)
-        else:
-            # 传统固定等待模式
-            WebDriverWait(driver, wait_time).until(
-                lambda d: d.execute_script("return document.readyState") == "complete"
-            )
-            time.sleep(wait_time)
-
-        if full_page:
-            total_height = driver.execute_script("return document.body.scrollHeight")
-            total_width = driver.execute_script("return document.body.scrollWidth")
-            driver.set_window_size(max(total_width, window_width),max(total_height,window_height))
-
-        result = driver.execute_cdp_cmd("Page.captureScreenshot", {
-            "captureBeyondViewport": full_page,
-            "fromSurface": True
-        })
-
-        image_data = base64.b64decode(result['data'])
-
-        output_file = Path(output_path)
-        output_file.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(output_file, 'wb') as f:
-            f.write(image_data)
+        output_file = save_image(image_data, output_path)
 
         if verbose:
             print(f"截图已保存至：{output_file.absolute()}", file=sys.stderr)
@@ -255,8 +481,11 @@ def take_screenshot(url: str, output_path: str = "screenshot.png",
 
     except Exception as e:
         print(f"错误：{e}", file=sys.stderr)
+        if driver:
+            pool.discard(driver)
+            driver = None
         return False
 
     finally:
         if driver:
-            driver.quit()
+            pool.release(driver)
@@ -2,15 +2,19 @@
 HTTP API 服务 - 使用 FastAPI 提供网页截图接口
 """
 
+import asyncio
 import base64
-import io
 import argparse
-from typing import Optional
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal, Optional, Tuple, Union
 
 from fastapi import FastAPI, Response, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from webpage_screenshot.screenshot import take_screenshot
+from webpage_screenshot.screenshot import (block_urls, wait_for_page, capture_page, save_image,
+                                           set_viewport_size, track_requests, guess_image_format)
+from webpage_screenshot.pool import POOL_SIZE, get_pool
 
 app = FastAPI(
     title="Webpage Screenshot API",
@@ -18,6 +22,22 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# 截图工作线程数与浏览器池大小一致，每个线程同一时间只占用一个浏览器
+EXECUTOR = ThreadPoolExecutor(max_workers=POOL_SIZE)
+_semaphore: Optional[asyncio.Semaphore] = None
+
+# 单次批量截图最多包含的 URL 数：所有标签页共用一个浏览器、依次等待，过大的批次会长时间占用
+# 工作线程并耗尽浏览器内存
+BATCH_MAX_SIZE = int(os.environ.get("WEBSHOT_BATCH_MAX_SIZE", "10"))
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """返回限制并发截图数的信号量（在事件循环内首次使用时创建）"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(POOL_SIZE)
+    return _semaphore
+
 
 class ScreenshotParams(BaseModel):
     """截图请求参数"""
@@ -29,6 +49,117 @@ class ScreenshotParams(BaseModel):
     window_width: int = 1920
     window_height: int = 1080
     return_format: str = "binary"  # "binary" or "base64"
+    format: Optional[Literal["png", "jpeg", "webp"]] = None  # 默认按 output_path 扩展名推断，否则为 png
+    quality: int = Field(80, ge=0, le=100)  # 仅对 jpeg / webp 生效
+    block_patterns: Optional[List[str]] = None  # 屏蔽的请求 URL 模式，None 使用默认列表
+
+
+def _image_format(params: ScreenshotParams) -> str:
+    """返回本次截图使用的图片格式：优先使用 format，其次按 output_path 扩展名推断"""
+    if params.format:
+        return params.format
+    if params.output_path:
+        return guess_image_format(params.output_path)
+    return "png"
+
+
+def _do_screenshot(params: ScreenshotParams) -> Union[bytes, str]:
+    """
+    在工作线程中执行截图（Selenium 调用均为阻塞操作）
+
+    return_format=base64 时直接返回 CDP 给出的 base64 字符串，否则返回图片数据
+    """
+    pool = get_pool()
+    # 从浏览器池取出 driver 用于获取截图
+    driver = pool.acquire(
+        headless=True,
+        window_width=params.window_width,
+        window_height=params.window_height,
+        verbose=False,
+        page_load_timeout=120  # 增加页面加载超时时间
+    )
+    try:
+        block_urls(driver, params.block_patterns)
+        driver.get(params.url)
+        wait_for_page(driver, params.wait_time, params.auto_wait)
+        data = capture_page(driver, params.full_page, _image_format(params), params.quality)
+    except Exception:
+        pool.discard(driver)
+        raise
+    pool.release(driver)
+
+    # CDP 返回的本身就是 base64，仅在需要二进制数据时解码
+    if params.output_path or params.return_format != "base64":
+        image_data = base64.b64decode(data)
+        # 如果需要保存到文件
+        if params.output_path:
+            save_image(image_data, params.output_path)
+        if params.return_format != "base64":
+            return image_data
+
+    return data
+
+
+def _do_batch(items: List[ScreenshotParams]) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+    """
+    在同一个浏览器的多个标签页中批量截图
+
+    返回 (images, errors)：images 为 base64 编码的图片，errors 为对应项的错误信息；
+    单个 URL 等待或截图失败时该项图片为 None，不影响其余项。
+
+    先为每个 URL 打开一个标签页并发起导航（不等待加载），让各页面在浏览器内
+    并行加载，再逐个切换标签页等待并截图。
+    """
+    first = items[0]
+    pool = get_pool()
+    driver = pool.acquire(
+        headless=True,
+        window_width=first.window_width,
+        window_height=first.window_height,
+        verbose=False,
+        page_load_timeout=120
+    )
+    try:
+        # 先在原始标签页中打开全部空白标签页：若在刚开始导航的标签页上执行
+        # window.open，chromedriver 会等待该页加载完成，各页面就变成依次加载
+        handles = []
+        known = set(driver.window_handles)
+        for _ in items:
+            driver.execute_script("window.open('about:blank', '_blank')")
+            handle = [h for h in driver.window_handles if h not in known][0]
+            known.add(handle)
+            handles.append(handle)
+
+        for item, handle in zip(items, handles):
+            # 屏蔽规则、请求计数和视口尺寸都按标签页生效，需在导航前设置
+            driver.switch_to.window(handle)
+            block_urls(driver, item.block_patterns)
+            track_requests(driver)
+            # 新标签页使用浏览器窗口的原始尺寸，需按本项设置视口
+            set_viewport_size(driver, item.window_width, item.window_height)
+            driver.execute_script("window.location.href = arguments[0]", item.url)
+
+        results = []
+        errors = []
+        for item, handle in zip(items, handles):
+            try:
+                driver.switch_to.window(handle)
+                wait_for_page(driver, item.wait_time, item.auto_wait)
+                data = capture_page(driver, item.full_page, _image_format(item), item.quality)
+                if item.output_path:
+                    save_image(base64.b64decode(data), item.output_path)
+            except Exception as e:
+                results.append(None)
+                errors.append(str(e))
+            else:
+                results.append(data)
+                errors.append(None)
+    except Exception:
+        pool.discard(driver)
+        raise
+    # 出错的标签页由 release() 关闭，重置失败时浏览器会被直接关闭
+    pool.release(driver)
+    return results, errors
 
 
 @app.post("/screenshot")
@@ -36,66 +167,55 @@ async def screenshot(params: ScreenshotParams) -> Response:
     """
     网页截图接口
 
+    截图在线程池中执行，不阻塞事件循环；同时处理的请求数不超过 POOL_SIZE，
+    其余请求排队等待。
+
     返回格式：
-    - return_format=binary: 直接返回 PNG 图片
+    - return_format=binary: 直接返回图片
     - return_format=base64: 返回 JSON 包含 base64 编码的图片
-    """
-    from webpage_screenshot.screenshot import setup_driver, wait_for_page_loaded, wait_for_images_loaded
-    from selenium.webdriver.support.ui import WebDriverWait
-    import time
 
-    driver = None
+    图片格式：
+    - format=png: 无损，体积最大（未指定时按 output_path 扩展名推断，否则为 png）
+    - format=jpeg / webp: 有损压缩，按 quality 调整画质，整页截图通常只有 PNG 的几分之一
+    """
     try:
-        # 设置 driver 用于获取截图
-        driver = setup_driver(
-            headless=True,
-            window_width=params.window_width,
-            window_height=params.window_height,
-            verbose=False,
-            page_load_timeout=120  # 增加页面加载超时时间
-        )
-        driver.get(params.url)
-
-        if params.auto_wait:
-            wait_for_page_loaded(driver, timeout=params.wait_time * 10, verbose=False)
-            wait_for_images_loaded(driver, timeout=params.wait_time, verbose=False)
-        else:
-            WebDriverWait(driver, params.wait_time).until(
-                lambda d: d.execute_script("return document.readyState") == "complete"
-            )
-            time.sleep(params.wait_time)
-
-        if params.full_page:
-            total_height = driver.execute_script("return document.body.scrollHeight")
-            total_width = driver.execute_script("return document.body.scrollWidth")
-            driver.set_window_size(max(total_width, params.window_width), max(total_height, params.window_height))
+        async with _get_semaphore():
+            loop = asyncio.get_running_loop()
+            image = await loop.run_in_executor(EXECUTOR, _do_screenshot, params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        result = driver.execute_cdp_cmd("Page.captureScreenshot", {
-            "captureBeyondViewport": params.full_page,
-            "fromSurface": True
-        })
+    # 返回格式处理
+    if params.return_format == "base64":
+        return {"success": True, "image": image}
+    else:
+        return Response(content=image, media_type=f"image/{_image_format(params)}")
 
-        image_data = base64.b64decode(result['data'])
 
-        # 如果需要保存到文件
-        if params.output_path:
-            from pathlib import Path
-            output_file = Path(params.output_path)
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, 'wb') as f:
-                f.write(image_data)
-
-        # 返回格式处理
-        if params.return_format == "base64":
-            return {"success": True, "image": base64.b64encode(image_data).decode('utf-8')}
-        else:
-            return Response(content=image_data, media_type="image/png")
+@app.post("/screenshot/batch")
+async def screenshot_batch(items: List[ScreenshotParams]):
+    """
+    批量网页截图接口
 
+    所有 URL 共用一个浏览器，每个 URL 一个标签页，省去多次启动浏览器的开销。
+    单次最多 BATCH_MAX_SIZE 个 URL，超出时返回 422。
+    各项的 return_format 被忽略，统一返回 JSON：images 为按请求顺序排列的
+    base64 编码图片，errors 为对应项的错误信息；某一项失败时其图片为 null，
+    success 为 false，其余项照常返回。
+    """
+    if not items:
+        return {"success": True, "images": [], "errors": []}
+    if len(items) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=422,
+                            detail=f"批量截图最多 {BATCH_MAX_SIZE} 个 URL，收到 {len(items)} 个")
+    try:
+        async with _get_semaphore():
+            loop = asyncio.get_running_loop()
+            images, errors = await loop.run_in_executor(EXECUTOR, _do_batch, items)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if driver:
-            driver.quit()
+
+    return {"success": all(error is None for error in errors), "images": images, "errors": errors}
 
 
 @app.get("/health")